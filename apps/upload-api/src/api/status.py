@@ -1,52 +1,146 @@
 """Status API endpoints"""
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from datetime import datetime
+from typing import Optional
+import base64
+import json
 import logging
+import uuid
+import orjson
 
-from src.services.database import execute_one, execute_query
+from src.services.cache import (
+    get_json, set_json, status_key, recording_key, list_key,
+    STATUS_TTL, TERMINAL_STATUS_TTL, LIST_TTL
+)
+from src.services.database import execute_prepared_one, execute_prepared_query, iter_query, register_statement
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 200
 
-@router.get("/upload/{upload_id}/status")
-async def get_upload_status(upload_id: str):
-    """
-    Get the status of an upload and its processing
-    """
-    try:
-        query = """
-            SELECT
+TERMINAL_PROCESSING_STATUSES = ('completed', 'failed')
+
+_LIST_COLUMNS = """
                 id,
                 filename,
                 file_size,
-                content_type,
                 upload_status,
                 processing_status,
-                created_at,
-                completed_at,
-                metadata
-            FROM uploads
-            WHERE id = $1
-        """
+                created_at
+"""
+
+STATUS_SQL = register_statement("upload_status", """
+    SELECT
+        id,
+        filename,
+        file_size,
+        content_type,
+        upload_status,
+        processing_status,
+        created_at,
+        completed_at,
+        metadata
+    FROM documents
+    WHERE id = $1
+""")
+
+LIST_SQL = register_statement("list_uploads", f"""
+    SELECT {_LIST_COLUMNS}
+    FROM documents
+    ORDER BY created_at DESC, id DESC
+    LIMIT $1
+""")
+
+LIST_AFTER_SQL = register_statement("list_uploads_after", f"""
+    SELECT {_LIST_COLUMNS}
+    FROM documents
+    WHERE (created_at, id) < ($1, $2)
+    ORDER BY created_at DESC, id DESC
+    LIMIT $3
+""")
+
+
+def _encode_cursor(created_at: datetime, upload_id) -> str:
+    """Encode the last row's sort key as an opaque page cursor"""
+    payload = json.dumps({"ts": created_at.isoformat(), "id": str(upload_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Decode a page cursor back into its (created_at, id) sort key"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["ts"]), uuid.UUID(payload["id"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _serialize_list_row(row) -> dict:
+    """Shape a documents row for list responses"""
+    return {
+        "upload_id": str(row['id']),
+        "filename": row['filename'],
+        "file_size": row['file_size'],
+        "upload_status": row['upload_status'],
+        "processing_status": row['processing_status'],
+        "created_at": row['created_at']
+    }
+
+
+@router.get("/upload/{upload_id}/status")
+async def get_upload_status(upload_id: uuid.UUID):
+    """
+    Get the status of an upload and its processing
+
+    Answers 202 while a just-finished upload's row is still being written,
+    and reports the upload as failed if that write gave up.
+    """
+    try:
+        key = status_key(str(upload_id))
+        if (cached := await get_json(key)) is not None:
+            return cached
 
-        result = await execute_one(query, upload_id)
+        result = await execute_prepared_one("upload_status", upload_id)
 
         if not result:
+            if (recording := await get_json(recording_key(str(upload_id)))) is not None:
+                if recording.get("failed"):
+                    return {
+                        "upload_id": str(upload_id),
+                        "filename": recording["filename"],
+                        "upload_status": "failed",
+                        "processing_status": "failed",
+                        "message": "Upload could not be recorded; please upload the file again"
+                    }
+                return ORJSONResponse(status_code=202, content={
+                    "upload_id": str(upload_id),
+                    "filename": recording["filename"],
+                    "upload_status": "completed",
+                    "processing_status": "queued",
+                    "message": "Upload stored; metadata is being recorded"
+                })
             raise HTTPException(status_code=404, detail="Upload not found")
 
-        return {
+        response = {
             "upload_id": str(result['id']),
             "filename": result['filename'],
             "file_size": result['file_size'],
             "content_type": result['content_type'],
             "upload_status": result['upload_status'],
             "processing_status": result['processing_status'],
-            "created_at": result['created_at'].isoformat() if result['created_at'] else None,
-            "completed_at": result['completed_at'].isoformat() if result['completed_at'] else None,
+            "created_at": result['created_at'],
+            "completed_at": result['completed_at'],
             "metadata": result['metadata']
         }
 
+        terminal = result['processing_status'] in TERMINAL_PROCESSING_STATUSES
+        await set_json(key, response, TERMINAL_STATUS_TTL if terminal else STATUS_TTL)
+
+        return response
+
     except HTTPException:
         raise
     except Exception as e:
@@ -55,44 +149,84 @@ async def get_upload_status(upload_id: str):
 
 
 @router.get("/uploads")
-async def list_uploads(limit: int = 50, offset: int = 0):
+async def list_uploads(cursor: Optional[str] = None, limit: int = 50):
     """
     List recent uploads
+
+    Uses keyset pagination on (created_at, id); pass the returned
+    next_cursor to fetch the following page.
     """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
     try:
-        query = """
-            SELECT
-                id,
-                filename,
-                file_size,
-                upload_status,
-                processing_status,
-                created_at
-            FROM uploads
-            ORDER BY created_at DESC
-            LIMIT $1 OFFSET $2
-        """
+        key = list_key(cursor, limit)
+        if (cached := await get_json(key)) is not None:
+            return cached
+
+        if cursor:
+            created_at, upload_id = _decode_cursor(cursor)
+            results = await execute_prepared_query("list_uploads_after", created_at, upload_id, limit)
+        else:
+            results = await execute_prepared_query("list_uploads", limit)
 
-        results = await execute_query(query, limit, offset)
+        uploads = [_serialize_list_row(row) for row in results]
 
-        uploads = []
-        for row in results:
-            uploads.append({
-                "upload_id": str(row['id']),
-                "filename": row['filename'],
-                "file_size": row['file_size'],
-                "upload_status": row['upload_status'],
-                "processing_status": row['processing_status'],
-                "created_at": row['created_at'].isoformat() if row['created_at'] else None
-            })
+        next_cursor = None
+        if len(results) == limit:
+            last = results[-1]
+            next_cursor = _encode_cursor(last['created_at'], last['id'])
 
-        return {
+        response = {
             "uploads": uploads,
             "count": len(uploads),
             "limit": limit,
-            "offset": offset
+            "next_cursor": next_cursor
         }
 
+        await set_json(key, response, LIST_TTL)
+
+        return response
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to list uploads: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/uploads/stream")
+async def stream_uploads(cursor: Optional[str] = None):
+    """
+    Stream all uploads as NDJSON, newest first
+
+    Rows are fetched from a server-side cursor and written as they
+    arrive, so memory stays bounded by the fetch batch. Pass a cursor
+    from /uploads to start after a given row.
+    """
+    if cursor:
+        created_at, upload_id = _decode_cursor(cursor)
+        query = f"""
+            SELECT {_LIST_COLUMNS}
+            FROM documents
+            WHERE (created_at, id) < ($1, $2)
+            ORDER BY created_at DESC, id DESC
+        """
+        args = (created_at, upload_id)
+    else:
+        query = f"""
+            SELECT {_LIST_COLUMNS}
+            FROM documents
+            ORDER BY created_at DESC, id DESC
+        """
+        args = ()
+
+    async def generate():
+        try:
+            async for row in iter_query(query, *args):
+                yield orjson.dumps(_serialize_list_row(row)) + b"\n"
+        except Exception as e:
+            # Headers are already sent; the truncated stream signals the failure
+            logger.error(f"Failed to stream uploads: {e}")
+            raise
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -1,68 +1,243 @@
 """Upload API endpoints"""
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.responses import JSONResponse
-from typing import Optional
+from multipart.multipart import parse_options_header
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from urllib.parse import unquote_plus
+import asyncio
+import asyncpg
+import hmac
 import logging
 import uuid
+import uuid_utils
+from botocore.exceptions import ClientError
 from datetime import datetime
 
-from src.config import settings
-from src.services.minio_client import get_client
-from src.services.database import execute_one, execute_command
+from src.config import Settings, get_settings
+from src.services.minio_client import get_client, presign_post, upload_stream
+from src.services.database import execute_command, execute_prepared_one, register_statement, part_columns
+from src.services.cache import invalidate, set_json, status_key, recording_key, RECORDING_TTL, RECORDING_FAILED_TTL
+from src.services.part_writer import record_part, take_pending, restore_pending
+from src.services import multipart_store
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+INSERT_UPLOAD_SQL = register_statement("insert_upload", """
+    INSERT INTO documents (id, filename, file_size, content_type, minio_bucket, minio_key, upload_status)
+    VALUES ($1, $2, $3, $4, $5, $6, $7)
+    RETURNING id, created_at
+""")
+
+# Upserts the still-buffered parts and marks the upload completed in one statement:
+# the data-modifying CTE runs even though the UPDATE never reads it
+COMPLETE_UPLOAD_SQL = register_statement("complete_multipart_upload", """
+    WITH parts AS (
+        INSERT INTO upload_parts (upload_id, part_number, etag, size)
+        SELECT * FROM unnest($3::uuid[], $4::int[], $5::text[], $6::bigint[])
+        ON CONFLICT (upload_id, part_number)
+        DO UPDATE SET etag = EXCLUDED.etag, size = EXCLUDED.size
+    )
+    UPDATE documents
+    SET file_size = $2, upload_status = 'completed', completed_at = NOW()
+    WHERE id = $1
+""")
+
+NOTIFY_REJECT_SQL = """
+    UPDATE documents
+    SET file_size = $2, upload_status = 'failed', error_message = $3
+    WHERE id = $1 AND upload_status = 'pending'
+"""
+
+NOTIFY_COMPLETE_SQL = """
+    UPDATE documents
+    SET file_size = $2, upload_status = 'completed', completed_at = NOW()
+    WHERE id = $1 AND upload_status = 'pending'
+"""
+
+RECORD_ATTEMPTS = 3  # tries for the deferred documents INSERT before giving up
+RECORD_RETRY_DELAY = 0.5  # seconds, doubled after each failed try
+
+# Bounds concurrent part PUTs to MinIO from this worker process
+_part_semaphore = asyncio.Semaphore(get_settings().multipart_concurrency)
+# Bounds concurrent streaming uploads, each holding about three chunk_size parts in memory
+_stream_semaphore = asyncio.Semaphore(get_settings().stream_upload_concurrency)
+
+
+async def _queued_parts(
+    stream: AsyncIterator[bytes],
+    part_size: int,
+    max_size: int
+) -> AsyncIterator[bytes]:
+    """
+    Re-chunk a request body stream into part_size pieces
 
-@router.post("/upload")
-async def upload_file(
-    file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
+    A producer task reads the body into a one-slot queue while the caller
+    uploads the previous part, so at most about three parts are in memory
+    (uploading, queued, filling) regardless of the body size. Each part
+    is assembled with a single join over the received chunks.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def produce():
+        try:
+            pieces = []
+            buffered = 0
+            total = 0
+            async for chunk in stream:
+                total += len(chunk)
+                if total > max_size:
+                    raise HTTPException(status_code=413, detail="Upload exceeds maximum size")
+                chunk = memoryview(chunk)
+                while buffered + len(chunk) >= part_size:
+                    take = part_size - buffered
+                    pieces.append(chunk[:take])
+                    await queue.put(b"".join(pieces))
+                    chunk = chunk[take:]
+                    pieces, buffered = [], 0
+                if chunk:
+                    pieces.append(chunk)
+                    buffered += len(chunk)
+            if pieces:
+                await queue.put(b"".join(pieces))
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await queue.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+
+
+def _new_upload_id() -> str:
+    """Generate a time-ordered (UUIDv7) upload id so documents inserts append to the btree"""
+    return str(uuid_utils.uuid7())
+
+
+def _upload_filename(request: Request, filename: Optional[str]) -> str:
+    """Resolve the upload filename from the query string or Content-Disposition"""
+    if not filename:
+        _, options = parse_options_header(request.headers.get("content-disposition", ""))
+        filename = options.get(b"filename", b"").decode()
+    filename = Path(filename).name
+    if not filename:
+        raise HTTPException(status_code=400, detail="filename is required")
+    return filename
+
+
+async def _record_upload(
+    upload_id: str,
+    filename: str,
+    file_size: int,
+    content_type: Optional[str],
+    bucket: str,
+    object_name: str
 ):
     """
-    Upload a file to MinIO
+    Insert the documents row for a stored object, after the response is sent
 
-    This endpoint streams the file directly to MinIO without loading it into memory.
-    After upload completes, a Temporal workflow is triggered to process the document.
+    The insert is retried with backoff. If every try fails, the object is
+    removed and the recording marker is left behind as a failure, so the
+    status endpoint reports it instead of answering 404.
     """
+    delay = RECORD_RETRY_DELAY
+    for attempt in range(1, RECORD_ATTEMPTS + 1):
+        try:
+            await execute_prepared_one(
+                "insert_upload",
+                upload_id,
+                filename,
+                file_size,
+                content_type,
+                bucket,
+                object_name,
+                'completed'
+            )
+            break
+        except asyncpg.UniqueViolationError:
+            # An earlier try committed but its reply was lost
+            break
+        except Exception as e:
+            logger.error(f"Failed to record upload {upload_id} (attempt {attempt}/{RECORD_ATTEMPTS}): {e}")
+            if attempt == RECORD_ATTEMPTS:
+                await _fail_recording(upload_id, filename, bucket, object_name)
+                return
+            # Keep the marker alive while we back off
+            await set_json(recording_key(upload_id), {"filename": filename}, RECORDING_TTL)
+            await asyncio.sleep(delay)
+            delay *= 2
+
+    await invalidate(recording_key(upload_id))
+
+
+async def _fail_recording(upload_id: str, filename: str, bucket: str, object_name: str):
+    """Mark an upload whose row could not be written as failed and drop its object"""
+    await set_json(recording_key(upload_id), {"filename": filename, "failed": True}, RECORDING_FAILED_TTL)
     try:
-        upload_id = str(uuid.uuid4())
-        object_name = f"{upload_id}/{file.filename}"
-        minio = get_client()
-
-        # Get file size (for multipart upload detection)
-        file.file.seek(0, 2)
-        file_size = file.file.tell()
-        file.file.seek(0)
+        await get_client().delete_object(Bucket=bucket, Key=object_name)
+    except Exception as e:
+        logger.error(f"Failed to remove unrecorded object {object_name}: {e}")
 
-        logger.info(f"Starting upload: {file.filename} ({file_size} bytes)")
 
-        # Stream upload to MinIO
-        minio.put_object(
-            bucket_name=settings.minio_bucket,
-            object_name=object_name,
-            data=file.file,
-            length=file_size,
-            content_type=file.content_type
-        )
+@router.post("/upload")
+async def upload_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    filename: Optional[str] = None,
+    settings: Settings = Depends(get_settings)
+):
+    """
+    Upload a file to MinIO
 
-        # Store metadata in database
-        query = """
-            INSERT INTO uploads (id, filename, file_size, content_type, minio_bucket, minio_key, upload_status)
-            VALUES ($1, $2, $3, $4, $5, $6, $7)
-            RETURNING id, created_at
-        """
+    The request body is the raw file (not a multipart form). Pass the name
+    as ?filename= or in a Content-Disposition header, and the file type as
+    Content-Type. The body is streamed to MinIO part by part without being
+    spooled to disk. The response is sent as soon as MinIO has the object;
+    the database row is written right after, and until then the status
+    endpoint answers 202. After upload completes, a Temporal workflow is
+    triggered to process the document.
+    """
+    try:
+        try:
+            content_length = int(request.headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+        if content_length > settings.max_upload_size:
+            raise HTTPException(status_code=413, detail="Upload exceeds maximum size")
+
+        filename = _upload_filename(request, filename)
+        content_type = request.headers.get("content-type")
+        upload_id = _new_upload_id()
+        object_name = f"{upload_id}/{filename}"
 
-        result = await execute_one(
-            query,
+        logger.info(f"Starting upload: {filename}")
+
+        # Stream upload to MinIO in chunk_size parts; the size is counted as we go.
+        # Waiting uploads leave their bodies unread, so TCP backpressure holds them
+        async with _stream_semaphore:
+            parts = _queued_parts(request.stream(), settings.chunk_size, settings.max_upload_size)
+            try:
+                file_size = await upload_stream(object_name, parts, content_type=content_type)
+            finally:
+                await parts.aclose()
+
+        # Store metadata in database once the response is on its way
+        await set_json(recording_key(upload_id), {"filename": filename}, RECORDING_TTL)
+        background_tasks.add_task(
+            _record_upload,
             upload_id,
-            file.filename,
+            filename,
             file_size,
-            file.content_type,
+            content_type,
             settings.minio_bucket,
-            object_name,
-            'completed'
+            object_name
         )
 
         # TODO: Trigger Temporal workflow for processing
@@ -72,38 +247,193 @@ async def upload_file(
 
         return {
             "upload_id": upload_id,
-            "filename": file.filename,
+            "filename": filename,
             "file_size": file_size,
             "status": "completed",
             "message": "File uploaded successfully. Processing will begin shortly."
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Upload failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/upload/init")
+async def init_presigned_upload(
+    filename: str,
+    content_type: Optional[str] = None,
+    settings: Settings = Depends(get_settings)
+):
+    """
+    Initialize a direct-to-MinIO upload
+
+    Returns a presigned POST: the client sends a multipart/form-data POST
+    to url with every entry of fields followed by the file as "file", so
+    the bytes never pass through the API. MinIO rejects files over
+    max_upload_size. The upload is marked completed when MinIO reports the
+    new object to /upload/notify.
+    """
+    try:
+        filename = Path(filename).name
+        if not filename:
+            raise HTTPException(status_code=400, detail="filename is required")
+
+        upload_id = _new_upload_id()
+        object_name = f"{upload_id}/{filename}"
+
+        presigned = await presign_post(object_name, content_type)
+
+        await execute_prepared_one(
+            "insert_upload",
+            upload_id,
+            filename,
+            0,
+            content_type,
+            settings.minio_bucket,
+            object_name,
+            'pending'
+        )
+
+        logger.info(f"Presigned upload initialized: {upload_id}")
+
+        return {
+            "upload_id": upload_id,
+            "url": presigned["url"],
+            "method": "POST",
+            "fields": presigned["fields"],
+            "object_name": object_name,
+            "max_size": settings.max_upload_size,
+            "expires_in": settings.presigned_url_expiry
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Presigned upload init failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/upload/notify")
+async def upload_notification(request: Request, settings: Settings = Depends(get_settings)):
+    """
+    Receive MinIO bucket notifications for presigned uploads
+
+    Configure MinIO to send s3:ObjectCreated events here, e.g.:
+
+        mc admin config set ALIAS notify_webhook:kb \\
+            endpoint=http://kb-upload-api:8000/api/v1/upload/notify auth_token=$MINIO_WEBHOOK_TOKEN
+        mc event add ALIAS/BUCKET arn:minio:sqs::kb:webhook --event put
+
+    Objects written by the other upload paths are ignored, since only
+    'pending' uploads are updated. Objects over max_upload_size are marked
+    failed and deleted. Notifications are refused unless MINIO_WEBHOOK_TOKEN
+    is set.
+    """
+    if not settings.minio_webhook_token:
+        raise HTTPException(status_code=403, detail="Upload notifications are disabled")
+    expected = f"Bearer {settings.minio_webhook_token}".encode()
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode(), expected):
+        raise HTTPException(status_code=401, detail="Invalid webhook token")
+
+    try:
+        event = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid notification payload")
+
+    try:
+        objects = []
+        for record in event.get("Records", []):
+            obj = record["s3"]["object"]
+            size = obj.get("size", 0)
+            if not isinstance(size, int):
+                raise TypeError("object size must be an integer")
+            objects.append((unquote_plus(obj["key"]), size))
+    except (KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid notification payload")
+
+    try:
+        for key, size in objects:
+            upload_id = key.split("/", 1)[0]
+            try:
+                uuid.UUID(upload_id)
+            except ValueError:
+                continue
+
+            # The POST policy caps the size already; this guards policies signed before it did
+            if size > settings.max_upload_size:
+                result = await execute_command(
+                    NOTIFY_REJECT_SQL, upload_id, size, "Upload exceeds maximum size"
+                )
+                if result == "UPDATE 1":
+                    await invalidate(status_key(upload_id))
+                    await get_client().delete_object(Bucket=settings.minio_bucket, Key=key)
+                    logger.warning(f"Presigned upload rejected as too large: {upload_id} ({size} bytes)")
+                continue
+
+            result = await execute_command(NOTIFY_COMPLETE_SQL, upload_id, size)
+            if result == "UPDATE 1":
+                await invalidate(status_key(upload_id))
+
+                # TODO: Trigger Temporal workflow for processing
+
+                logger.info(f"Presigned upload completed: {upload_id}")
+
+        return {"status": "ok"}
+
+    except Exception as e:
+        logger.error(f"Upload notification failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/upload/multipart/init")
-async def init_multipart_upload(filename: str, content_type: Optional[str] = None):
+async def init_multipart_upload(
+    filename: str,
+    content_type: Optional[str] = None,
+    settings: Settings = Depends(get_settings)
+):
     """
     Initialize a multipart upload for large files (>100MB)
 
     Returns an upload_id and minio_upload_id to use for uploading parts.
     """
     try:
-        upload_id = str(uuid.uuid4())
+        upload_id = _new_upload_id()
         object_name = f"{upload_id}/{filename}"
         minio = get_client()
 
-        # TODO: Initialize multipart upload in MinIO
-        # minio_upload_id = minio.create_multipart_upload(...)
+        response = await minio.create_multipart_upload(
+            Bucket=settings.minio_bucket,
+            Key=object_name,
+            ContentType=content_type or "application/octet-stream"
+        )
+        minio_upload_id = response["UploadId"]
+
+        # Record the upload up front so parts and status lookups can reference it
+        await execute_prepared_one(
+            "insert_upload",
+            upload_id,
+            filename,
+            0,
+            content_type,
+            settings.minio_bucket,
+            object_name,
+            'uploading'
+        )
+
+        # Parts may land on any API worker, so the ledger lives in Redis
+        await multipart_store.create_upload(upload_id, object_name, minio_upload_id, filename, content_type)
 
         logger.info(f"Multipart upload initialized: {upload_id}")
 
         return {
             "upload_id": upload_id,
+            "minio_upload_id": minio_upload_id,
             "filename": filename,
             "object_name": object_name,
+            "part_size": settings.chunk_size,
+            "max_concurrency": settings.multipart_concurrency,
             "message": "Multipart upload initialized. Upload parts using /upload/multipart/part endpoint."
         }
 
@@ -116,44 +446,122 @@ async def init_multipart_upload(filename: str, content_type: Optional[str] = Non
 async def upload_part(
     upload_id: str,
     part_number: int,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    settings: Settings = Depends(get_settings)
 ):
     """
     Upload a part of a multipart upload
     """
     try:
-        # TODO: Upload part to MinIO and store ETag
+        upload = await multipart_store.get_upload(upload_id)
+        if not upload:
+            raise HTTPException(status_code=404, detail="Multipart upload not found")
+
+        # Parts may arrive concurrently; cap how many are in flight to MinIO,
+        # and only pull a part into memory once it holds a slot
+        async with _part_semaphore:
+            body = await file.read()
+            response = await get_client().upload_part(
+                Bucket=settings.minio_bucket,
+                Key=upload["object_name"],
+                PartNumber=part_number,
+                UploadId=upload["minio_upload_id"],
+                Body=body
+            )
+            size = len(body)
+            del body
+
+        # A retried part number replaces the earlier ETag, as it does in S3
+        await multipart_store.record_part(upload_id, part_number, response["ETag"], size)
+        record_part(upload_id, part_number, response["ETag"], size)
 
         logger.info(f"Part {part_number} uploaded for {upload_id}")
 
         return {
             "upload_id": upload_id,
             "part_number": part_number,
+            "etag": response["ETag"],
             "status": "uploaded"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Part upload failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _complete_object(bucket: str, upload: dict, parts: list[dict]):
+    """Ask MinIO to assemble the parts, accepting an upload it already completed"""
+    client = get_client()
+    try:
+        await client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=upload["object_name"],
+            UploadId=upload["minio_upload_id"],
+            MultipartUpload={"Parts": parts}
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchUpload":
+            raise
+        # Completed by an earlier attempt that failed before recording it
+        try:
+            await client.head_object(Bucket=bucket, Key=upload["object_name"])
+        except ClientError:
+            raise e
+        logger.info(f"Multipart upload already completed in MinIO: {upload['object_name']}")
+
+
 @router.post("/upload/multipart/complete")
-async def complete_multipart_upload(upload_id: str):
+async def complete_multipart_upload(upload_id: str, settings: Settings = Depends(get_settings)):
     """
     Complete a multipart upload
     """
     try:
-        # TODO: Complete multipart upload in MinIO
+        upload, uploaded_parts = await multipart_store.get_upload_with_parts(upload_id)
+        if not upload:
+            raise HTTPException(status_code=404, detail="Multipart upload not found")
+        if not uploaded_parts:
+            raise HTTPException(status_code=400, detail="No parts uploaded")
+
+        parts = [
+            {"PartNumber": number, "ETag": part["etag"]}
+            for number, part in sorted(uploaded_parts.items())
+        ]
+        file_size = sum(part["size"] for part in uploaded_parts.values())
+
+        # A retry after a failed database write must not ask MinIO to complete again
+        if not upload["completed"]:
+            await _complete_object(settings.minio_bucket, upload, parts)
+            await multipart_store.mark_completed(upload_id)
+
+        # Write any still-buffered parts and mark the upload completed in one round-trip
+        pending = take_pending(upload_id)
+        try:
+            await execute_prepared_one("complete_multipart_upload", upload_id, file_size, *part_columns(pending))
+        except Exception:
+            restore_pending(pending)
+            raise
+
+        await invalidate(status_key(upload_id))
+
+        await multipart_store.delete_upload(upload_id)
+
         # TODO: Trigger Temporal workflow
 
-        logger.info(f"Multipart upload completed: {upload_id}")
+        logger.info(f"Multipart upload completed: {upload_id} ({len(parts)} parts)")
 
         return {
             "upload_id": upload_id,
+            "filename": upload["filename"],
+            "file_size": file_size,
+            "parts": len(parts),
             "status": "completed",
             "message": "Upload completed successfully"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Multipart complete failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
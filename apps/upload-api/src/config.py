@@ -1,4 +1,8 @@
 """Application configuration"""
+import os
+import re
+from functools import lru_cache
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from typing import Optional
 from pathlib import Path
@@ -12,6 +16,16 @@ def read_secret(secret_name: str) -> Optional[str]:
     return None
 
 
+# Docker secrets, read once per process
+_SECRETS = {
+    name: read_secret(name)
+    for name in ("minio_access_key", "minio_secret_key", "openai_api_key", "supabase_db_password")
+}
+
+# Password segment of a postgres:<password>@host URL
+_PW_RE = re.compile(r'(postgres:)[^@]*(@)')
+
+
 class Settings(BaseSettings):
     """Application settings loaded from environment variables or Docker secrets"""
 
@@ -21,23 +35,9 @@ class Settings(BaseSettings):
     minio_secret_key: Optional[str] = None
     minio_bucket: str = "document-uploads"
     minio_secure: bool = False
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Override with Docker secrets if available
-        self.minio_access_key = read_secret("minio_access_key") or self.minio_access_key
-        self.minio_secret_key = read_secret("minio_secret_key") or self.minio_secret_key
-        self.database_url = self._build_database_url()
-        self.openai_api_key = read_secret("openai_api_key") or self.openai_api_key
-
-    def _build_database_url(self) -> str:
-        """Build database URL with password from secret if available"""
-        password = read_secret("supabase_db_password")
-        if password and hasattr(self, 'database_url'):
-            # Replace password in existing URL
-            import re
-            return re.sub(r'(postgres:)[^@]*(@)', rf'\1{password}\2', self.database_url)
-        return getattr(self, 'database_url', '')
+    minio_public_endpoint: Optional[str] = None  # host:port clients use for presigned URLs
+    minio_webhook_token: Optional[str] = None  # bearer token MinIO sends to /upload/notify
+    presigned_url_expiry: int = 3600  # seconds
 
     # Redis Configuration
     redis_host: str = "root_redis_1"
@@ -46,6 +46,9 @@ class Settings(BaseSettings):
 
     # PostgreSQL Configuration
     database_url: str
+    pg_pool_min: int = 0
+    pg_pool_max: int = max(10, (os.cpu_count() or 1) * 2)  # per API worker process
+    pg_pgbouncer: bool = False  # connecting through pgbouncer in transaction mode
 
     # Temporal Configuration
     temporal_host: str = "temporal"
@@ -57,8 +60,12 @@ class Settings(BaseSettings):
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     max_upload_size: int = 10737418240  # 10GB
-    chunk_size: int = 104857600  # 100MB
+    chunk_size: int = 104857600  # 100MB (keep >= 64MB for multipart throughput)
+    multipart_concurrency: int = 8  # concurrent part uploads to MinIO
+    stream_upload_concurrency: int = 4  # concurrent POST /upload bodies per API worker (~3 x chunk_size RAM each)
+    minio_max_connections: int = 64  # HTTP pool shared by streaming, multipart and presign calls
     workers: int = 4
+    api_reload: bool = False  # auto-reload for local development; runs a single process
 
     # Embedding API Configuration
     openai_api_key: Optional[str] = None
@@ -70,10 +77,28 @@ class Settings(BaseSettings):
     environment: str = "development"
     log_level: str = "INFO"
 
+    @model_validator(mode='after')
+    def _inject_secrets(self) -> 'Settings':
+        """Override with Docker secrets if available"""
+        self.minio_access_key = _SECRETS["minio_access_key"] or self.minio_access_key
+        self.minio_secret_key = _SECRETS["minio_secret_key"] or self.minio_secret_key
+        self.openai_api_key = _SECRETS["openai_api_key"] or self.openai_api_key
+        password = _SECRETS["supabase_db_password"]
+        if password:
+            # Replace password in existing URL; callable repl keeps backslashes literal
+            self.database_url = _PW_RE.sub(lambda m: f"{m[1]}{password}{m[2]}", self.database_url)
+        return self
+
     class Config:
         env_file = ".env"
         case_sensitive = False
 
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the process-wide settings instance"""
+    return Settings()
+
+
 # Global settings instance
-settings = Settings()
+settings = get_settings()
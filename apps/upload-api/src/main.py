@@ -1,15 +1,18 @@
 """Main FastAPI application"""
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 import time
 
-from src.config import settings
+from src.config import Settings, get_settings, settings
 from src.api import upload, status
 from src.services.database import init_db, close_db
-from src.services.minio_client import init_minio, minio_client
+from src.services.minio_client import init_minio, close_minio, minio_client
+from src.services.cache import init_cache, close_cache
+from src.services.part_writer import start_part_writer, stop_part_writer
+from src.services.metrics import create_metrics_app, mark_worker_exited, reset_metrics_dir
 
 
 # Configure logging
@@ -34,11 +37,22 @@ async def lifespan(app: FastAPI):
     await init_minio()
     logger.info(f"MinIO initialized - bucket: {settings.minio_bucket}")
 
+    # Initialize Redis cache
+    await init_cache()
+    logger.info("Cache initialized")
+
+    # Start batched multipart part writer
+    await start_part_writer()
+
     yield
 
     # Shutdown
     logger.info("Shutting down Document Upload API...")
+    await stop_part_writer()
     await close_db()
+    await close_minio()
+    await close_cache()
+    mark_worker_exited()
 
 
 # Create FastAPI app
@@ -46,7 +60,8 @@ app = FastAPI(
     title="Document Upload & Processing API",
     description="Upload large documents (10GB+) and process them with AI agents",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -81,7 +96,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 # Health check
 @app.get("/health")
-async def health_check():
+async def health_check(settings: Settings = Depends(get_settings)):
     """Health check endpoint"""
     return {
         "status": "healthy",
@@ -103,6 +118,10 @@ async def root():
     }
 
 
+# Prometheus metrics (merged across workers when PROMETHEUS_MULTIPROC_DIR is set)
+app.mount("/metrics", create_metrics_app())
+
+
 # Include routers
 app.include_router(upload.router, prefix="/api/v1", tags=["upload"])
 app.include_router(status.router, prefix="/api/v1", tags=["status"])
@@ -110,9 +129,17 @@ app.include_router(status.router, prefix="/api/v1", tags=["status"])
 
 if __name__ == "__main__":
     import uvicorn
+    reload = settings.api_reload
+    reset_metrics_dir()
     uvicorn.run(
         "src.main:app",
         host=settings.api_host,
         port=settings.api_port,
-        reload=settings.environment == "development"
+        reload=reload,
+        # Reload mode runs a single process; otherwise use one worker per configured core
+        workers=None if reload else settings.workers,
+        loop="uvloop",
+        http="httptools",
+        backlog=2048,
+        limit_concurrency=1000
     )
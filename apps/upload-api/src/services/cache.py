@@ -0,0 +1,95 @@
+"""Redis cache service"""
+import logging
+from typing import Any, Optional
+
+import orjson
+import redis.asyncio as redis
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Global Redis client
+redis_client: Optional[redis.Redis] = None
+
+STATUS_TTL = 5  # seconds, while an upload is still moving through the pipeline
+TERMINAL_STATUS_TTL = 3600  # seconds, once processing has completed or failed
+LIST_TTL = 2  # seconds, for dashboard polling of list pages
+RECORDING_TTL = 60  # seconds, upper bound for an upload's deferred database insert
+RECORDING_FAILED_TTL = 86400  # seconds, how long status reports a deferred insert that gave up
+
+
+def status_key(upload_id: str) -> str:
+    """Cache key for an upload's status response"""
+    return f"upload:{upload_id}:status"
+
+
+def recording_key(upload_id: str) -> str:
+    """Marker key for an upload whose database row is still being written"""
+    return f"upload:{upload_id}:recording"
+
+
+def list_key(cursor: Optional[str], limit: int) -> str:
+    """Cache key for one page of the uploads list"""
+    return f"uploads:list:{cursor or ''}:{limit}"
+
+
+async def init_cache():
+    """Initialize the Redis client"""
+    global redis_client
+
+    redis_client = redis.Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db
+    )
+    logger.info(f"Redis client initialized for {settings.redis_host}:{settings.redis_port}")
+
+
+async def close_cache():
+    """Close the Redis client"""
+    global redis_client
+
+    if redis_client:
+        await redis_client.aclose()
+        redis_client = None
+        logger.info("Redis client closed")
+
+
+def get_redis() -> redis.Redis:
+    """Get the Redis client"""
+    if not redis_client:
+        raise RuntimeError("Redis client not initialized")
+    return redis_client
+
+
+async def get_json(key: str) -> Optional[Any]:
+    """Return a cached value, or None on a miss or if Redis is unavailable"""
+    if not redis_client:
+        return None
+    try:
+        cached = await redis_client.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache get failed for {key}: {e}")
+        return None
+    return orjson.loads(cached) if cached else None
+
+
+async def set_json(key: str, value: Any, ttl: int):
+    """Cache a value for ttl seconds; failures are logged and ignored"""
+    if not redis_client:
+        return
+    try:
+        await redis_client.set(key, orjson.dumps(value), ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Cache set failed for {key}: {e}")
+
+
+async def invalidate(key: str):
+    """Drop a cached value; failures are logged and ignored"""
+    if not redis_client:
+        return
+    try:
+        await redis_client.delete(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache invalidate failed for {key}: {e}")
@@ -1,27 +1,84 @@
 """Database service using asyncpg"""
+import asyncio
 import asyncpg
 import logging
+from contextlib import asynccontextmanager
 from typing import Optional
+from prometheus_client import Gauge
 from src.config import settings
 
 logger = logging.getLogger(__name__)
 
 # Global connection pool
 _pool: Optional[asyncpg.Pool] = None
+_pool_sampler: Optional[asyncio.Task] = None
+
+# Hot queries by key, prepared once on every new pool connection
+_statements: dict[str, str] = {}
+
+# Pool contention shows up as size == max with no idle connections. Values are
+# summed over live API workers, so any worker's /metrics reports the whole service
+POOL_SAMPLE_INTERVAL = 1.0  # seconds
+POOL_SIZE = Gauge("upload_api_db_pool_size", "Open connections in the database pools", multiprocess_mode="livesum")
+POOL_IDLE = Gauge("upload_api_db_pool_idle", "Idle connections in the database pools", multiprocess_mode="livesum")
+POOL_MAX = Gauge("upload_api_db_pool_max", "Maximum connections in the database pools", multiprocess_mode="livesum")
+
+
+class _Connection(asyncpg.Connection):
+    """Pool connection that carries its prepared hot statements"""
+    __slots__ = ('_prepared',)
+
+
+def register_statement(key: str, query: str) -> str:
+    """Register a hot query to be prepared when pool connections are opened"""
+    _statements[key] = query
+    return query
+
+
+async def _init_connection(conn: _Connection):
+    """Prepare registered statements so requests skip parse/plan"""
+    conn._prepared = {}
+    if settings.pg_pgbouncer:
+        # Transaction pooling cannot keep named statements on a server connection
+        return
+    for key, query in _statements.items():
+        conn._prepared[key] = await conn.prepare(query)
+
+
+async def _sample_pool():
+    """Publish pool usage; multiprocess gauges cannot be read lazily at scrape time"""
+    while True:
+        POOL_SIZE.set(_pool.get_size())
+        POOL_IDLE.set(_pool.get_idle_size())
+        await asyncio.sleep(POOL_SAMPLE_INTERVAL)
 
 
 async def init_db():
     """Initialize database connection pool"""
-    global _pool
+    global _pool, _pool_sampler
+
+    server_settings = {'application_name': 'upload-api'}
+    if not settings.pg_pgbouncer:
+        # pgbouncer rejects these startup parameters; set them on the role instead.
+        # JIT planning costs more than it saves on sub-millisecond OLTP queries
+        server_settings.update({'jit': 'off', 'search_path': 'public'})
 
     try:
         _pool = await asyncpg.create_pool(
             settings.database_url,
-            min_size=2,
-            max_size=10,
-            command_timeout=60
+            min_size=settings.pg_pool_min,
+            max_size=settings.pg_pool_max,
+            command_timeout=60,
+            # pgbouncer transaction mode breaks asyncpg's named statement cache
+            statement_cache_size=0 if settings.pg_pgbouncer else 1024,
+            server_settings=server_settings,
+            connection_class=_Connection,
+            init=_init_connection
         )
-        logger.info("Database pool created successfully")
+        logger.info(f"Database pool created successfully (max {settings.pg_pool_max} connections)")
+
+        POOL_MAX.set(settings.pg_pool_max)
+        _pool_sampler = asyncio.create_task(_sample_pool())
 
         # Test connection
         async with _pool.acquire() as conn:
@@ -35,20 +92,32 @@ async def init_db():
 
 async def close_db():
     """Close database connection pool"""
-    global _pool
+    global _pool, _pool_sampler
+
+    if _pool_sampler:
+        _pool_sampler.cancel()
+        _pool_sampler = None
 
     if _pool:
         await _pool.close()
         logger.info("Database pool closed")
 
 
-async def get_conn():
+def get_conn():
     """Get a database connection from the pool"""
     if not _pool:
         raise RuntimeError("Database pool not initialized")
     return _pool.acquire()
 
 
+@asynccontextmanager
+async def transaction():
+    """Acquire a connection and run the block inside one transaction"""
+    async with get_conn() as conn:
+        async with conn.transaction():
+            yield conn
+
+
 async def execute_query(query: str, *args):
     """Execute a query and return results"""
     async with get_conn() as conn:
@@ -61,7 +130,67 @@ async def execute_one(query: str, *args):
         return await conn.fetchrow(query, *args)
 
 
+async def _get_statement(conn, key: str):
+    """Look up a prepared statement, preparing it if registered after connect"""
+    statement = conn._prepared.get(key)
+    if statement is None:
+        statement = conn._prepared[key] = await conn.prepare(_statements[key])
+    return statement
+
+
+async def execute_prepared_query(key: str, *args):
+    """Execute a registered statement and return results"""
+    async with get_conn() as conn:
+        if settings.pg_pgbouncer:
+            return await conn.fetch(_statements[key], *args)
+        return await (await _get_statement(conn, key)).fetch(*args)
+
+
+async def execute_prepared_one(key: str, *args):
+    """Execute a registered statement and return one result"""
+    async with get_conn() as conn:
+        if settings.pg_pgbouncer:
+            return await conn.fetchrow(_statements[key], *args)
+        return await (await _get_statement(conn, key)).fetchrow(*args)
+
+
 async def execute_command(query: str, *args):
     """Execute a command (INSERT, UPDATE, DELETE)"""
     async with get_conn() as conn:
         return await conn.execute(query, *args)
+
+
+async def iter_query(query: str, *args, batch: int = 200):
+    """Iterate over query results with a server-side cursor, fetching in batches"""
+    async with get_conn() as conn:
+        async with conn.transaction():
+            async for record in conn.cursor(query, *args, prefetch=batch):
+                yield record
+
+
+def part_columns(rows: list[tuple]) -> tuple[list, list, list, list]:
+    """Split (upload_id, part_number, etag, size) rows into the column arrays unnest() takes"""
+    if not rows:
+        return [], [], [], []
+    upload_ids, part_numbers, etags, sizes = (list(column) for column in zip(*rows))
+    return upload_ids, part_numbers, etags, sizes
+
+
+async def flush_parts(rows: list[tuple]):
+    """
+    Write (upload_id, part_number, etag, size) rows in one multi-row INSERT
+
+    Retried parts overwrite the earlier row, which COPY cannot do.
+    """
+    if not rows:
+        return
+
+    query = """
+        INSERT INTO upload_parts (upload_id, part_number, etag, size)
+        SELECT * FROM unnest($1::uuid[], $2::int[], $3::text[], $4::bigint[])
+        ON CONFLICT (upload_id, part_number)
+        DO UPDATE SET etag = EXCLUDED.etag, size = EXCLUDED.size
+    """
+
+    async with get_conn() as conn:
+        await conn.execute(query, *part_columns(rows))
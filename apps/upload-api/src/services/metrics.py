@@ -0,0 +1,33 @@
+"""Prometheus metrics, aggregated across API worker processes"""
+import glob
+import os
+
+from prometheus_client import CollectorRegistry, make_asgi_app, multiprocess
+
+# Set (to an existing directory) before prometheus_client is imported to enable
+# multiprocess mode: each worker writes its samples there and /metrics merges them
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def reset_metrics_dir():
+    """Remove sample files left by earlier runs; call in the parent before workers start"""
+    if MULTIPROC_DIR:
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+        for path in glob.glob(os.path.join(MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+
+
+def mark_worker_exited():
+    """Drop this worker's samples from live gauges"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def create_metrics_app():
+    """ASGI app serving metrics for every worker, or just this process outside multiprocess mode"""
+    if not MULTIPROC_DIR:
+        return make_asgi_app()
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return make_asgi_app(registry=registry)
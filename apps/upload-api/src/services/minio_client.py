@@ -1,39 +1,68 @@
 """MinIO client service"""
 import logging
-from minio import Minio
-from minio.error import S3Error
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, Optional
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from botocore.exceptions import ClientError
 from src.config import settings
 
 logger = logging.getLogger(__name__)
 
-# Global MinIO client
-minio_client: Minio = None
+# Global MinIO client (async S3 API)
+minio_client = None
+# Client that signs presigned URLs for the endpoint clients can reach
+presign_client = None
+_exit_stack: AsyncExitStack = None
+
+
+def _create_client(session, endpoint: str):
+    """Create an async S3 client context for a MinIO endpoint"""
+    scheme = "https" if settings.minio_secure else "http"
+    return session.create_client(
+        "s3",
+        endpoint_url=f"{scheme}://{endpoint}",
+        aws_access_key_id=settings.minio_access_key,
+        aws_secret_access_key=settings.minio_secret_key,
+        region_name="us-east-1",
+        config=AioConfig(max_pool_connections=settings.minio_max_connections)
+    )
 
 
 async def init_minio():
     """Initialize MinIO client and create bucket if needed"""
-    global minio_client
+    global minio_client, presign_client, _exit_stack
 
     try:
         # Create MinIO client
-        minio_client = Minio(
-            settings.minio_endpoint,
-            access_key=settings.minio_access_key,
-            secret_key=settings.minio_secret_key,
-            secure=settings.minio_secure
+        session = get_session()
+        _exit_stack = AsyncExitStack()
+        minio_client = await _exit_stack.enter_async_context(
+            _create_client(session, settings.minio_endpoint)
         )
 
         logger.info(f"MinIO client initialized for endpoint: {settings.minio_endpoint}")
 
-        # Create bucket if it doesn't exist
+        # Presigned URLs embed the host in their signature, so sign for the public endpoint
+        if settings.minio_public_endpoint:
+            presign_client = await _exit_stack.enter_async_context(
+                _create_client(session, settings.minio_public_endpoint)
+            )
+        else:
+            presign_client = minio_client
+
+        # Create bucket if it doesn't exist, in one idempotent call
         bucket_name = settings.minio_bucket
-        if not minio_client.bucket_exists(bucket_name):
-            minio_client.make_bucket(bucket_name)
+        try:
+            await minio_client.create_bucket(Bucket=bucket_name)
             logger.info(f"Created bucket: {bucket_name}")
-        else:
-            logger.info(f"Bucket already exists: {bucket_name}")
+        except (
+            minio_client.exceptions.BucketAlreadyOwnedByYou,
+            minio_client.exceptions.BucketAlreadyExists
+        ):
+            logger.debug(f"Bucket already exists: {bucket_name}")
 
-    except S3Error as e:
+    except ClientError as e:
         logger.error(f"MinIO error: {e}")
         raise
     except Exception as e:
@@ -41,8 +70,109 @@ async def init_minio():
         raise
 
 
-def get_client() -> Minio:
+async def close_minio():
+    """Close the MinIO client"""
+    global minio_client, presign_client, _exit_stack
+
+    if _exit_stack:
+        await _exit_stack.aclose()
+        _exit_stack = None
+        minio_client = None
+        presign_client = None
+        logger.info("MinIO client closed")
+
+
+def get_client():
     """Get the MinIO client"""
     if not minio_client:
         raise RuntimeError("MinIO client not initialized")
     return minio_client
+
+
+async def presign_post(object_name: str, content_type: Optional[str] = None) -> dict:
+    """
+    Return a presigned POST that lets a client upload an object directly to MinIO
+
+    Unlike a presigned PUT, the POST policy carries a content-length-range
+    condition, so MinIO itself refuses bodies over max_upload_size. The
+    result holds the form "url" and the "fields" to send before the file.
+    """
+    if not presign_client:
+        raise RuntimeError("MinIO client not initialized")
+
+    fields = {}
+    conditions = [["content-length-range", 0, settings.max_upload_size]]
+    if content_type:
+        fields["Content-Type"] = content_type
+        conditions.append({"Content-Type": content_type})
+
+    return await presign_client.generate_presigned_post(
+        Bucket=settings.minio_bucket,
+        Key=object_name,
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=settings.presigned_url_expiry
+    )
+
+
+async def upload_stream(
+    object_name: str,
+    parts: AsyncIterator[bytes],
+    content_type: Optional[str] = None
+) -> int:
+    """
+    Upload an object of unknown length from an async iterator of parts
+
+    Each item is sent as one multipart part, so all items but the last must
+    be at least 5MB. A body that fits in a single part is sent with one
+    put_object instead. Returns the number of bytes written.
+    """
+    client = get_client()
+    bucket = settings.minio_bucket
+    content_type = content_type or "application/octet-stream"
+
+    first = await anext(parts, b"")
+    second = await anext(parts, None)
+    if second is None:
+        await client.put_object(Bucket=bucket, Key=object_name, Body=first, ContentType=content_type)
+        return len(first)
+
+    response = await client.create_multipart_upload(Bucket=bucket, Key=object_name, ContentType=content_type)
+    upload_id = response["UploadId"]
+
+    async def remaining():
+        yield first
+        yield second
+        async for part in parts:
+            yield part
+
+    completed = []
+    size = 0
+    try:
+        part_number = 0
+        async for part in remaining():
+            part_number += 1
+            response = await client.upload_part(
+                Bucket=bucket,
+                Key=object_name,
+                PartNumber=part_number,
+                UploadId=upload_id,
+                Body=part
+            )
+            completed.append({"PartNumber": part_number, "ETag": response["ETag"]})
+            size += len(part)
+
+        await client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=object_name,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": completed}
+        )
+    except BaseException:
+        try:
+            await client.abort_multipart_upload(Bucket=bucket, Key=object_name, UploadId=upload_id)
+        except Exception as e:
+            logger.error(f"Failed to abort multipart upload {upload_id}: {e}")
+        raise
+
+    return size
@@ -0,0 +1,79 @@
+"""Redis-backed ledger of in-flight multipart uploads"""
+import logging
+from typing import Optional
+
+import orjson
+
+from src.services.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Matches how long an abandoned multipart upload is worth keeping around
+LEDGER_TTL = 7 * 24 * 3600  # seconds
+
+_PART_PREFIX = "part:"
+_COMPLETED_FIELD = "completed"
+
+
+def _ledger_key(upload_id: str) -> str:
+    return f"multipart:{upload_id}"
+
+
+async def create_upload(upload_id: str, object_name: str, minio_upload_id: str,
+                        filename: str, content_type: Optional[str]):
+    """Record a new multipart upload so any API worker can accept its parts"""
+    key = _ledger_key(upload_id)
+    meta = {
+        "object_name": object_name,
+        "minio_upload_id": minio_upload_id,
+        "filename": filename,
+        "content_type": content_type
+    }
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.hset(key, "meta", orjson.dumps(meta))
+        pipe.expire(key, LEDGER_TTL)
+        await pipe.execute()
+
+
+async def get_upload(upload_id: str) -> Optional[dict]:
+    """Return an upload's metadata, or None if it is unknown"""
+    meta = await get_redis().hget(_ledger_key(upload_id), "meta")
+    return orjson.loads(meta) if meta else None
+
+
+async def record_part(upload_id: str, part_number: int, etag: str, size: int):
+    """Record a part; a retried part number replaces the earlier entry"""
+    await get_redis().hset(
+        _ledger_key(upload_id),
+        f"{_PART_PREFIX}{part_number}",
+        orjson.dumps({"etag": etag, "size": size})
+    )
+
+
+async def mark_completed(upload_id: str):
+    """Record that MinIO has assembled the object, so a retried completion skips that step"""
+    await get_redis().hset(_ledger_key(upload_id), _COMPLETED_FIELD, b"1")
+
+
+async def get_upload_with_parts(upload_id: str) -> tuple[Optional[dict], dict[int, dict]]:
+    """
+    Return an upload's metadata and its parts keyed by part number, in one read
+
+    The metadata carries "completed": True once mark_completed has run.
+    """
+    fields = await get_redis().hgetall(_ledger_key(upload_id))
+    meta = fields.pop(b"meta", None)
+    completed = fields.pop(_COMPLETED_FIELD.encode(), None) is not None
+    parts = {
+        int(field[len(_PART_PREFIX):]): orjson.loads(value)
+        for field, value in ((f.decode(), v) for f, v in fields.items())
+        if field.startswith(_PART_PREFIX)
+    }
+    if not meta:
+        return None, parts
+    return {**orjson.loads(meta), "completed": completed}, parts
+
+
+async def delete_upload(upload_id: str):
+    """Forget a finished multipart upload"""
+    await get_redis().delete(_ledger_key(upload_id))
@@ -0,0 +1,127 @@
+"""Batched writer for multipart part metadata"""
+import asyncio
+import logging
+from typing import Optional
+
+import asyncpg
+
+from src.services.database import flush_parts
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.2  # seconds
+FLUSH_ROWS = 500
+MAX_FLUSH_ATTEMPTS = 5  # a row that fails this many flushes is dropped
+
+# Pending rows keyed by (upload_id, part_number) so a retried part replaces the earlier row
+_pending: dict[tuple[str, int], tuple] = {}
+# Failed flush attempts per pending row
+_attempts: dict[tuple[str, int], int] = {}
+_wakeup: Optional[asyncio.Event] = None
+_task: Optional[asyncio.Task] = None
+
+
+async def start_part_writer():
+    """Start the background flush task"""
+    global _wakeup, _task
+
+    _wakeup = asyncio.Event()
+    _task = asyncio.create_task(_run())
+    logger.info("Part writer started")
+
+
+async def stop_part_writer():
+    """Stop the background flush task and write out anything still pending"""
+    global _task
+
+    if _task:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+    await flush()
+    logger.info("Part writer stopped")
+
+
+def record_part(upload_id: str, part_number: int, etag: str, size: int):
+    """Queue a part row for the next batched flush"""
+    _pending[(upload_id, part_number)] = (upload_id, part_number, etag, size)
+    if len(_pending) >= FLUSH_ROWS and _wakeup:
+        _wakeup.set()
+
+
+def take_pending(upload_id: str) -> list[tuple]:
+    """Remove and return the queued rows for one upload, in part order"""
+    keys = sorted(key for key in _pending if key[0] == upload_id)
+    for key in keys:
+        _attempts.pop(key, None)
+    return [_pending.pop(key) for key in keys]
+
+
+def restore_pending(rows: list[tuple]):
+    """Queue rows again after a write that took them failed"""
+    for row in rows:
+        _pending.setdefault((row[0], row[1]), row)
+
+
+def _requeue(row: tuple, error: Exception):
+    """Put a failed row back for the next flush, or drop it once it has failed too often"""
+    key = (row[0], row[1])
+    attempts = _attempts.get(key, 0) + 1
+    if attempts >= MAX_FLUSH_ATTEMPTS:
+        _attempts.pop(key, None)
+        logger.error(f"Dropping part row {key} after {attempts} failed flushes: {error}")
+        return
+    # A newer row for the same part that arrived meanwhile wins
+    if _pending.setdefault(key, row) is row:
+        _attempts[key] = attempts
+
+
+async def flush():
+    """
+    Write all queued rows in a single statement
+
+    If the database rejects the batch, rows are retried one by one so a
+    single bad row (e.g. one whose upload was deleted) cannot hold back
+    the rest. Rows that keep failing are dropped after MAX_FLUSH_ATTEMPTS.
+    """
+    if not _pending:
+        return
+
+    rows = list(_pending.values())
+    _pending.clear()
+
+    try:
+        await flush_parts(rows)
+    except asyncpg.PostgresError as e:
+        logger.error(f"Failed to flush {len(rows)} part rows, retrying individually: {e}")
+        for row in rows:
+            try:
+                await flush_parts([row])
+            except Exception as row_error:
+                _requeue(row, row_error)
+            else:
+                _attempts.pop((row[0], row[1]), None)
+        return
+    except Exception as e:
+        logger.error(f"Failed to flush {len(rows)} part rows: {e}")
+        for row in rows:
+            _requeue(row, e)
+        return
+
+    for row in rows:
+        _attempts.pop((row[0], row[1]), None)
+
+
+async def _run():
+    """Flush every FLUSH_INTERVAL seconds, or sooner once FLUSH_ROWS are queued"""
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        await flush()
@@ -0,0 +1,53 @@
+"""Tests for the batched part metadata writer"""
+import asyncpg
+import pytest
+
+from src.services import part_writer
+
+BAD_UPLOAD = "deleted-upload"
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """Rows that reached the database; batches containing BAD_UPLOAD are rejected"""
+    rows = []
+
+    async def flush_parts(batch, conn=None):
+        if any(row[0] == BAD_UPLOAD for row in batch):
+            raise asyncpg.ForeignKeyViolationError("upload_parts_upload_id_fkey")
+        rows.extend(batch)
+
+    monkeypatch.setattr(part_writer, "flush_parts", flush_parts)
+    monkeypatch.setattr(part_writer, "_pending", {})
+    monkeypatch.setattr(part_writer, "_attempts", {})
+    return rows
+
+
+async def test_flush_writes_good_rows_around_a_bad_one(written):
+    part_writer.record_part("u1", 1, "e1", 5)
+    part_writer.record_part(BAD_UPLOAD, 1, "e2", 5)
+    part_writer.record_part("u1", 2, "e3", 5)
+
+    await part_writer.flush()
+
+    assert sorted(written) == [("u1", 1, "e1", 5), ("u1", 2, "e3", 5)]
+    assert list(part_writer._pending) == [(BAD_UPLOAD, 1)]
+
+
+async def test_flush_drops_a_row_after_max_attempts(written):
+    part_writer.record_part(BAD_UPLOAD, 1, "e1", 5)
+
+    for _ in range(part_writer.MAX_FLUSH_ATTEMPTS):
+        await part_writer.flush()
+
+    assert part_writer._pending == {}
+    assert part_writer._attempts == {}
+
+
+async def test_restore_pending_keeps_newer_rows(monkeypatch):
+    monkeypatch.setattr(part_writer, "_pending", {})
+    part_writer.record_part("u1", 1, "newer", 5)
+
+    part_writer.restore_pending([("u1", 1, "older", 5), ("u1", 2, "e2", 5)])
+
+    assert part_writer.take_pending("u1") == [("u1", 1, "newer", 5), ("u1", 2, "e2", 5)]
@@ -0,0 +1,30 @@
+"""Tests for the deferred documents INSERT behind direct uploads"""
+import pytest
+
+from src.api import upload
+from src.services.cache import recording_key
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(upload, "RECORD_RETRY_DELAY", 0)
+
+
+async def _record():
+    await upload._record_upload("id-1", "a.txt", 5, "text/plain", "bucket", "id-1/a.txt")
+
+
+async def test_record_upload_retries_until_the_insert_succeeds(db, cache, s3):
+    db.failures = upload.RECORD_ATTEMPTS - 1
+    await _record()
+    assert len(db.prepared) == upload.RECORD_ATTEMPTS
+    assert recording_key("id-1") not in cache.entries
+    assert s3.deleted() == []
+
+
+async def test_record_upload_leaves_a_failed_marker_when_it_gives_up(db, cache, s3):
+    db.failures = upload.RECORD_ATTEMPTS
+    await _record()
+    assert len(db.prepared) == upload.RECORD_ATTEMPTS
+    assert cache.entries[recording_key("id-1")] == {"filename": "a.txt", "failed": True}
+    assert s3.deleted() == ["id-1/a.txt"]
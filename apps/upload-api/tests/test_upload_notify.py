@@ -0,0 +1,55 @@
+"""Tests for the MinIO upload notification webhook"""
+import pytest
+
+NOTIFY_URL = "/api/v1/upload/notify"
+AUTH = {"Authorization": "Bearer secret"}
+
+
+@pytest.fixture
+def settings(settings):
+    settings.minio_webhook_token = "secret"
+    return settings
+
+
+def _event(key: str, size) -> dict:
+    return {"Records": [{"s3": {"object": {"key": key, "size": size}}}]}
+
+
+def test_notify_refused_without_configured_token(client, settings):
+    settings.minio_webhook_token = None
+    response = client.post(NOTIFY_URL, json={"Records": []})
+    assert response.status_code == 403
+
+
+def test_notify_rejects_wrong_token(client):
+    response = client.post(NOTIFY_URL, json={"Records": []}, headers={"Authorization": "Bearer wrong"})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"Records": [{}]},
+    {"Records": [{"s3": {}}]},
+    _event("x", "big"),
+    {"Records": "nope"},
+])
+def test_notify_rejects_malformed_event(client, payload):
+    response = client.post(NOTIFY_URL, json=payload, headers=AUTH)
+    assert response.status_code == 400
+
+
+def test_notify_ignores_objects_outside_upload_prefixes(client, db):
+    response = client.post(NOTIFY_URL, json=_event("not-an-upload/a.txt", 1), headers=AUTH)
+    assert response.status_code == 200
+    assert db.commands == []
+
+
+def test_notify_rejects_and_deletes_oversized_objects(client, settings, db, cache, s3):
+    settings.max_upload_size = 10
+    upload_id = "0190a4b2-0000-7000-8000-000000000001"
+
+    response = client.post(NOTIFY_URL, json=_event(f"{upload_id}/a.txt", 11), headers=AUTH)
+
+    assert response.status_code == 200
+    assert db.commands == [(upload_id, 11, "Upload exceeds maximum size")]
+    assert s3.deleted() == [f"{upload_id}/a.txt"]
@@ -0,0 +1,83 @@
+"""Tests for streaming uploads: re-chunking, size limits and multipart abort"""
+import pytest
+from fastapi import HTTPException
+
+from src.api.upload import _queued_parts
+from src.services.minio_client import upload_stream
+
+
+async def _stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _collect(parts) -> list[bytes]:
+    return [part async for part in parts]
+
+
+async def test_queued_parts_split_on_part_boundaries():
+    parts = await _collect(_queued_parts(_stream(b"abc", b"defghij", b"klmnopqrstu", b"v"), 5, 100))
+    assert parts == [b"abcde", b"fghij", b"klmno", b"pqrst", b"uv"]
+
+
+async def test_queued_parts_exact_multiple_has_no_empty_tail():
+    parts = await _collect(_queued_parts(_stream(b"abcde", b"fg", b"hij"), 5, 100))
+    assert parts == [b"abcde", b"fghij"]
+
+
+async def test_queued_parts_empty_body():
+    assert await _collect(_queued_parts(_stream(), 5, 100)) == []
+
+
+async def test_queued_parts_rejects_body_over_max_size():
+    with pytest.raises(HTTPException) as exc:
+        await _collect(_queued_parts(_stream(b"abcde", b"fghij", b"k"), 5, 10))
+    assert exc.value.status_code == 413
+
+
+def test_upload_rejects_declared_size_over_limit(client, settings):
+    settings.max_upload_size = 4
+    response = client.post("/api/v1/upload?filename=a.txt", content=b"12345678")
+    assert response.status_code == 413
+
+
+def test_upload_rejects_malformed_content_length(client):
+    response = client.post(
+        "/api/v1/upload?filename=a.txt", content=b"1234", headers={"Content-Length": "abc"}
+    )
+    assert response.status_code == 400
+
+
+async def test_upload_stream_single_part_uses_put_object(s3):
+    size = await upload_stream("id/a.txt", _stream(b"hello"))
+    assert size == 5
+    assert s3.names() == ["put_object"]
+
+
+async def test_upload_stream_completes_parts_in_order(s3):
+    size = await upload_stream("id/a.txt", _stream(b"aa", b"bb", b"c"))
+    assert size == 5
+    assert s3.names() == [
+        "create_multipart_upload", "upload_part", "upload_part", "upload_part", "complete_multipart_upload"
+    ]
+    _, complete = s3.calls[-1]
+    assert complete["MultipartUpload"]["Parts"] == [
+        {"PartNumber": n, "ETag": f'"etag-{n}"'} for n in (1, 2, 3)
+    ]
+
+
+async def test_upload_stream_aborts_when_a_part_fails(s3):
+    s3.fail_part = 2
+    with pytest.raises(RuntimeError):
+        await upload_stream("id/a.txt", _stream(b"aa", b"bb", b"c"))
+    assert s3.names()[-1] == "abort_multipart_upload"
+    assert "complete_multipart_upload" not in s3.names()
+
+
+async def test_upload_stream_aborts_when_the_body_is_too_large(s3):
+    with pytest.raises(HTTPException) as exc:
+        await upload_stream("id/a.txt", _queued_parts(_stream(b"abcde", b"fghij", b"k"), 5, 10))
+    assert exc.value.status_code == 413
+    assert s3.names() == [
+        "create_multipart_upload", "upload_part", "upload_part", "abort_multipart_upload"
+    ]
@@ -0,0 +1,19 @@
+"""
+Object I/O helpers for document processing
+Reads byte ranges of stored documents with ranged GETs
+"""
+import asyncio
+
+
+def _read_object_range_sync(client, bucket: str, key: str, offset: int, length: int) -> bytes:
+    response = client.get_object(bucket, key, offset=offset, length=length)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+async def read_object_range(client, bucket: str, key: str, offset: int, length: int) -> bytes:
+    """Read a byte range of an object with a ranged GET, off the event loop"""
+    return await asyncio.to_thread(_read_object_range_sync, client, bucket, key, offset, length)
@@ -1,49 +1,217 @@
 """
 Temporal Worker for document processing
-Handles: Extract, Chunk, Embed, Store
+Handles: Extract + Chunk + Embed + Store in one activity
 """
 import asyncio
 import logging
+import os
 from datetime import timedelta
 from temporalio import workflow, activity
 from temporalio.client import Client
+from temporalio.common import RetryPolicy
+from temporalio.exceptions import ApplicationError
 from temporalio.worker import Worker
 
+with workflow.unsafe.imports_passed_through():
+    import asyncpg
+    import numpy as np
+    import redis.asyncio as redis
+    from minio import Minio
+    from openai import AsyncOpenAI
+    from pgvector.asyncpg import register_vector
+    from src.file_io import read_object_range
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBED_BATCH_SIZE = 256  # chunks per embeddings request
+COPY_BATCH_SIZE = 1000  # rows per COPY into document_chunks
+PROCESS_MAX_ATTEMPTS = 3  # chunk_embed_store attempts before the document is marked failed
 
-# TODO: Implement activities
-@activity.defn
-async def extract_text(document_id: str) -> str:
+SET_PROCESSING_STATUS_SQL = """
+    UPDATE documents SET processing_status = $2 WHERE id = $1
+    RETURNING minio_bucket, minio_key
+"""
+CLEAR_CHUNKS_SQL = "DELETE FROM document_chunks WHERE document_id = $1"
+
+# Shared with the upload API, which caches status responses under upload:{id}:status
+_redis_client = None
+
+
+def get_redis():
+    """Get the Redis client, creating it on first use inside an activity"""
+    global _redis_client
+
+    if _redis_client is None:
+        _redis_client = redis.Redis(
+            host=os.getenv("REDIS_HOST", "root_redis_1"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            db=int(os.getenv("REDIS_DB", "0"))
+        )
+    return _redis_client
+
+
+_minio_client = None
+
+
+def get_minio():
+    """Get the MinIO client, creating it on first use inside an activity"""
+    global _minio_client
+
+    if _minio_client is None:
+        _minio_client = Minio(
+            os.getenv("MINIO_ENDPOINT", "supabase-minio:9000"),
+            access_key=os.getenv("MINIO_ACCESS_KEY"),
+            secret_key=os.getenv("MINIO_SECRET_KEY"),
+            secure=os.getenv("MINIO_SECURE", "false").lower() == "true"
+        )
+    return _minio_client
+
+
+_db_pool = None
+_db_pool_lock = asyncio.Lock()
+
+
+async def get_db_pool():
+    """Get the database pool, creating it on first use inside an activity"""
+    global _db_pool
+
+    async with _db_pool_lock:
+        if _db_pool is not None:
+            return _db_pool
+
+        # Register pgvector's binary codecs on every connection so COPY ships raw fp16
+        _db_pool = await asyncpg.create_pool(
+            os.getenv("DATABASE_URL"),
+            min_size=1,
+            max_size=4,
+            init=register_vector
+        )
+        return _db_pool
+
+
+_openai_client = None
+
+
+def get_openai():
+    """Get the OpenAI client, creating it on first use inside an activity"""
+    global _openai_client
+
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai_client
+
+
+async def extract_text(document_id: str, bucket: str, key: str) -> str:
     """Extract text from document"""
     logger.info(f"Extracting text from document: {document_id}")
+
+    # Sniff the type with a ranged GET; only a real extractor needs the whole file
+    header = await read_object_range(get_minio(), bucket, key, 0, 8)
+    if header.startswith(b"%PDF"):
+        logger.info(f"Document {document_id} is a PDF")
     # TODO: Implement PDF/DOCX extraction
     return "Extracted text placeholder"
 
 
-@activity.defn
-async def chunk_document(text: str) -> list[str]:
+def chunk_document(text: str) -> list[str]:
     """Chunk document into segments"""
     logger.info(f"Chunking document ({len(text)} chars)")
     # TODO: Implement intelligent chunking
     return ["chunk1", "chunk2", "chunk3"]
 
 
-@activity.defn
 async def generate_embeddings(chunks: list[str]) -> list[list[float]]:
-    """Generate embeddings for chunks"""
-    logger.info(f"Generating embeddings for {len(chunks)} chunks")
-    # TODO: Call OpenAI API
-    return [[0.1] * 1536 for _ in chunks]  # Placeholder
+    """Generate embeddings for a batch of chunks in one API request"""
+    response = await get_openai().embeddings.create(input=chunks, model=EMBEDDING_MODEL)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+async def store_embeddings(
+    conn,
+    document_id: str,
+    first_index: int,
+    chunks: list[str],
+    embeddings: list[list[float]]
+):
+    """Store consecutive chunks and their embeddings with one binary COPY"""
+    # document_chunks.embedding is halfvec: quantize to fp16 before encoding
+    vectors = np.asarray(embeddings, dtype=np.float16)
+    records = [
+        (document_id, first_index + i, chunk, vector)
+        for i, (chunk, vector) in enumerate(zip(chunks, vectors))
+    ]
+    await conn.copy_records_to_table(
+        "document_chunks",
+        records=records,
+        columns=["document_id", "chunk_index", "chunk_text", "embedding"]
+    )
+
+
+async def set_processing_status(pool, document_id: str, status: str):
+    """Record a document's processing status and return where its object is stored"""
+    row = await pool.fetchrow(SET_PROCESSING_STATUS_SQL, document_id, status)
+    # Processing state changed; drop the API's cached status response (best effort:
+    # the cache entry expires on its own, and raising here would redo the whole activity)
+    try:
+        await get_redis().delete(f"upload:{document_id}:status")
+    except redis.RedisError as e:
+        logger.error(f"Failed to invalidate cached status for {document_id}: {e}")
+    return row
 
 
 @activity.defn
-async def store_embeddings(document_id: str, chunks: list[str], embeddings: list[list[float]]) -> bool:
-    """Store chunks and embeddings in database"""
-    logger.info(f"Storing {len(chunks)} chunks with embeddings")
-    # TODO: Insert into PostgreSQL
-    return True
+async def chunk_embed_store(document_id: str) -> int:
+    """
+    Extract, chunk, embed and store a document in one pass
+
+    Text is extracted inside the activity, chunks are embedded
+    EMBED_BATCH_SIZE at a time and written with COPY every
+    COPY_BATCH_SIZE rows, so neither the text nor the vectors travel
+    through workflow history. Returns the number of chunks stored.
+    """
+    pool = await get_db_pool()
+    document = await set_processing_status(pool, document_id, "processing")
+    if document is None:
+        raise ApplicationError(f"Document not found: {document_id}", non_retryable=True)
+
+    try:
+        text = await extract_text(document_id, document["minio_bucket"], document["minio_key"])
+        chunks = chunk_document(text)
+        activity.heartbeat(0)
+        logger.info(f"Embedding and storing {len(chunks)} chunks for document: {document_id}")
+
+        # A retried attempt starts over; drop rows an earlier attempt left behind
+        await pool.execute(CLEAR_CHUNKS_SQL, document_id)
+
+        stored = 0
+        pending = []
+        for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+            batch = chunks[start:start + EMBED_BATCH_SIZE]
+            pending.extend(await generate_embeddings(batch))
+
+            # Each COPY commits on its own, so no transaction stays open across OpenAI calls
+            if len(pending) >= COPY_BATCH_SIZE:
+                async with pool.acquire() as conn:
+                    await store_embeddings(conn, document_id, stored, chunks[stored:stored + len(pending)], pending)
+                stored += len(pending)
+                pending = []
+
+            activity.heartbeat(start + len(batch))
+
+        if pending:
+            async with pool.acquire() as conn:
+                await store_embeddings(conn, document_id, stored, chunks[stored:], pending)
+
+    except Exception:
+        # Earlier attempts will be retried; failed is terminal for API clients
+        if activity.info().attempt >= PROCESS_MAX_ATTEMPTS:
+            await set_processing_status(pool, document_id, "failed")
+        raise
+
+    await set_processing_status(pool, document_id, "completed")
+    return len(chunks)
 
 
 # TODO: Implement workflow
@@ -51,40 +219,21 @@ async def store_embeddings(document_id: str, chunks: list[str], embeddings: list
 class DocumentProcessingWorkflow:
     @workflow.run
     async def run(self, document_id: str) -> dict:
-        """Process document: extract -> chunk -> embed -> store"""
+        """Process document: extract + chunk + embed + store"""
 
-        # Extract
-        text = await workflow.execute_activity(
-            extract_text,
+        # Only the document id goes in and the chunk count comes out of history
+        chunks_count = await workflow.execute_activity(
+            chunk_embed_store,
             document_id,
-            start_to_close_timeout=timedelta(minutes=10),
-        )
-
-        # Chunk
-        chunks = await workflow.execute_activity(
-            chunk_document,
-            text,
-            start_to_close_timeout=timedelta(minutes=5),
-        )
-
-        # Embed
-        embeddings = await workflow.execute_activity(
-            generate_embeddings,
-            chunks,
-            start_to_close_timeout=timedelta(minutes=10),
-        )
-
-        # Store
-        stored = await workflow.execute_activity(
-            store_embeddings,
-            args=[document_id, chunks, embeddings],
-            start_to_close_timeout=timedelta(minutes=5),
+            start_to_close_timeout=timedelta(minutes=40),
+            heartbeat_timeout=timedelta(minutes=2),
+            retry_policy=RetryPolicy(maximum_attempts=PROCESS_MAX_ATTEMPTS),
         )
 
         return {
             "document_id": document_id,
-            "chunks_count": len(chunks),
-            "status": "completed" if stored else "failed"
+            "chunks_count": chunks_count,
+            "status": "completed"
         }
 
 
@@ -96,7 +245,7 @@ async def main():
         client,
         task_queue="document-processing",
         workflows=[DocumentProcessingWorkflow],
-        activities=[extract_text, chunk_document, generate_embeddings, store_embeddings],
+        activities=[chunk_embed_store],
     )
 
     logger.info("Worker started on queue: document-processing")
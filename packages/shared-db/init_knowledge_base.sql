@@ -24,7 +24,22 @@ CREATE TABLE IF NOT EXISTS documents (
 );
 
 CREATE INDEX IF NOT EXISTS idx_documents_status ON documents(upload_status, processing_status);
-CREATE INDEX IF NOT EXISTS idx_documents_created_at ON documents(created_at DESC);
+-- Keyset pagination for /uploads: WHERE (created_at, id) < (...) ORDER BY created_at DESC, id DESC
+-- (supersedes the created_at-only index)
+DROP INDEX IF EXISTS idx_documents_created_at;
+CREATE INDEX IF NOT EXISTS idx_documents_created_id ON documents(created_at DESC, id DESC);
+
+-- ============================================
+-- UPLOAD PARTS - Multipart upload part ledger
+-- ============================================
+CREATE TABLE IF NOT EXISTS upload_parts (
+    upload_id UUID REFERENCES documents(id) ON DELETE CASCADE,
+    part_number INTEGER NOT NULL CHECK (part_number BETWEEN 1 AND 10000),
+    etag TEXT NOT NULL,
+    size BIGINT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (upload_id, part_number)
+);
 
 -- ============================================
 -- DOCUMENT CHUNKS - Processed text with embeddings
@@ -34,7 +49,7 @@ CREATE TABLE IF NOT EXISTS document_chunks (
     document_id UUID REFERENCES documents(id) ON DELETE CASCADE,
     chunk_text TEXT NOT NULL,
     chunk_index INTEGER NOT NULL,
-    embedding vector(1536), -- OpenAI text-embedding-3-small
+    embedding halfvec(1536), -- OpenAI text-embedding-3-small, fp16 (pgvector >= 0.7)
     metadata JSONB DEFAULT '{}'::jsonb,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     UNIQUE(document_id, chunk_index)
@@ -42,7 +57,12 @@ CREATE TABLE IF NOT EXISTS document_chunks (
 
 -- Vector similarity search index (HNSW for performance)
 CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding ON document_chunks
-USING hnsw (embedding vector_cosine_ops);
+USING hnsw (embedding halfvec_cosine_ops);
+
+-- Existing databases created with vector(1536) can be converted in place:
+-- DROP INDEX IF EXISTS idx_document_chunks_embedding;
+-- ALTER TABLE document_chunks ALTER COLUMN embedding TYPE halfvec(1536) USING embedding::halfvec(1536);
+-- CREATE INDEX idx_document_chunks_embedding ON document_chunks USING hnsw (embedding halfvec_cosine_ops);
 
 CREATE INDEX IF NOT EXISTS idx_document_chunks_document_id ON document_chunks(document_id);
 
@@ -110,11 +130,11 @@ BEGIN
         dc.id,
         dc.document_id,
         dc.chunk_text,
-        1 - (dc.embedding <=> query_embedding) as similarity,
+        1 - (dc.embedding <=> query_embedding::halfvec(1536)) as similarity,
         dc.metadata
     FROM document_chunks dc
-    WHERE 1 - (dc.embedding <=> query_embedding) > match_threshold
-    ORDER BY dc.embedding <=> query_embedding
+    WHERE 1 - (dc.embedding <=> query_embedding::halfvec(1536)) > match_threshold
+    ORDER BY dc.embedding <=> query_embedding::halfvec(1536)
     LIMIT match_count;
 END;
 $$;